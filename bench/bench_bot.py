@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark: synthetic updates through dp.feed_update against a fake Bot API and a local Postgres.
+
+    python bench/bench_bot.py [--scenario all|start|groups|to_admin|broadcast] [--updates 5000]
+                              [--recipients 10000,100000] [--latency 0.01] [--rate-limit 0.0]
+
+Postgres: BENCH_DATABASE_URL if set (everything runs in a throwaway schema that is dropped afterwards),
+otherwise a temporary cluster created with initdb/pg_ctl from PATH. Nothing is sent to Telegram.
+
+Reported per scenario: updates/s, p50/p99 latency from queueing an update to its handler finishing, SQL statements per update (background
+flushes included, COPY excluded) and Bot API calls per update.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from pathlib import Path
+
+import asyncpg
+
+BOT_ID = 123456
+ADMIN = 1
+GROUP_BASE = -1001000000000
+
+
+# -------------------- Postgres --------------------
+class TempCluster:
+    """initdb + pg_ctl in a temp dir, unix socket only, fsync off."""
+
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix="narin-bench-")
+        self.data = os.path.join(self.dir, "data")
+
+    def start(self) -> str:
+        for tool in ("initdb", "pg_ctl"):
+            if not shutil.which(tool):
+                raise SystemExit(f"{tool} not found on PATH; set BENCH_DATABASE_URL instead")
+        subprocess.run(["initdb", "-D", self.data, "-U", "postgres", "-A", "trust", "-E", "UTF8", "--no-sync"],
+                       check=True, stdout=subprocess.DEVNULL)
+        opts = f"-k {self.dir} -c listen_addresses='' -c fsync=off -c synchronous_commit=off"
+        subprocess.run(["pg_ctl", "-D", self.data, "-o", opts, "-l", os.path.join(self.dir, "log"), "-w", "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        return f"postgresql://postgres@/postgres?host={self.dir}"
+
+    def stop(self):
+        subprocess.run(["pg_ctl", "-D", self.data, "-m", "immediate", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+QUERIES = 0
+
+
+def _count_query(_record):
+    global QUERIES
+    QUERIES += 1
+
+
+def patch_pool(schema: str):
+    """Every pooled connection lives in `schema` and reports its statements to QUERIES."""
+    create_pool = asyncpg.create_pool
+
+    async def init(conn):
+        conn.add_query_logger(_count_query)
+
+    def patched(*args, **kwargs):
+        kwargs.setdefault("init", init)
+        kwargs.setdefault("server_settings", {})["search_path"] = schema
+        return create_pool(*args, **kwargs)
+
+    asyncpg.create_pool = patched
+
+
+# -------------------- Fake Bot API --------------------
+def make_session(main, latency: float, rate_limit: float, retry_after: int):
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Message, MessageId, User
+    import random
+
+    class FakeSession(BaseSession):
+        """Answers every Bot API method locally after `latency` seconds; `rate_limit` of calls get a 429."""
+
+        def __init__(self):
+            super().__init__()
+            self.calls = 0
+            self._ids = itertools.count(1000)
+            self._rng = random.Random(1)
+
+        async def close(self):
+            pass
+
+        async def stream_content(self, *args, **kwargs):
+            yield b""
+
+        def _message(self, method) -> dict:
+            chat_id = getattr(method, "chat_id", ADMIN)
+            chat_id = chat_id if isinstance(chat_id, int) else GROUP_BASE
+            return {"message_id": next(self._ids), "date": int(time.time()), "text": "x",
+                    "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"}}
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls += 1
+            if latency:
+                await asyncio.sleep(latency)
+            if rate_limit and self._rng.random() < rate_limit:
+                body = {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after}}
+                return self.check_response(bot, method, 429, json.dumps(body))
+            returning = method.__returning__
+            if returning is Message or returning == typing.Union[Message, bool]:
+                result = self._message(method)
+            elif returning is MessageId:
+                result = {"message_id": next(self._ids)}
+            elif returning == typing.List[Message]:
+                result = [self._message(method) for _ in getattr(method, "media", [])]
+            elif returning == typing.List[MessageId]:
+                result = [{"message_id": next(self._ids)} for _ in method.message_ids]
+            elif returning is User:
+                result = {"id": BOT_ID, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+            else:
+                result = True
+            return self.check_response(bot, method, 200, json.dumps({"ok": True, "result": result})).result
+
+    session = FakeSession()
+    session.middleware = main.bot.session.middleware  # keep the metrics middleware in the path
+    return session
+
+
+# -------------------- Updates --------------------
+_update_ids = itertools.count(1)
+
+
+def message(chat_id: int, user_id: int, text: typing.Optional[str] = None, **extra) -> dict:
+    chat = {"id": chat_id, "type": "private"} if chat_id > 0 else {"id": chat_id, "type": "supergroup",
+                                                                      "title": f"group {chat_id}"}
+    msg = {"message_id": next(_update_ids), "date": int(time.time()), "chat": chat,
+           "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}}
+    if text is not None:
+        msg["text"] = text
+    msg.update(extra)
+    return {"update_id": next(_update_ids), "message": msg}
+
+
+def photo(chat_id: int, user_id: int, media_group_id: str) -> dict:
+    uid = f"p{next(_update_ids)}"
+    return message(chat_id, user_id, media_group_id=media_group_id,
+                   photo=[{"file_id": uid, "file_unique_id": uid, "width": 1, "height": 1}])
+
+
+def start_storm(n: int, rng) -> typing.List[dict]:
+    return [message(uid, uid, "/start") for uid in range(10_000, 10_000 + n)]
+
+
+def group_chatter(n: int, rng) -> typing.List[dict]:
+    words = "سلام خوبی امروز کسی میدونه ساعت چند کال داره لینک گروه قوانین ادمین ربات موزیک".split()
+    updates = []
+    for _ in range(n):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        if rng.random() < 0.05:
+            text += " نارین"
+        updates.append(message(GROUP_BASE - rng.randrange(50), 20_000 + rng.randrange(500), text))
+    return updates
+
+
+def to_admin(n: int, rng) -> typing.List[dict]:
+    """Users already in SendToAdmin state: 2/3 send a text, 1/3 a 3-photo album."""
+    updates, uid = [], 30_000
+    while len(updates) < n:
+        uid += 1
+        if uid % 3:
+            updates.append(message(uid, uid, "سلام، سفارش ممبر دارم"))
+        else:
+            updates.extend(photo(uid, uid, f"mg{uid}") for _ in range(3))
+    return updates
+
+
+# -------------------- Runner --------------------
+class Bench:
+    def __init__(self, main, session, concurrency: int):
+        self.main = main
+        self.session = session
+        self.concurrency = concurrency
+        self.errors = 0
+
+    async def drain(self):
+        m = self.main
+        await m.dp.drain()
+        while m.ALBUMS._albums or m.ALBUMS._flushing or m.BROADCASTS._jobs or m.ADMIN_RELAY._tasks:
+            await asyncio.sleep(0.05)
+        for service in (m.LOG_SINK, m.PROFILES, m.GROUPS, m.DELETES):
+            await service.flush()
+
+    async def feed(self, raw: typing.List[dict]) -> typing.List[float]:
+        from aiogram.types import Update
+        updates = [Update.model_validate(u, context={"bot": self.main.bot}) for u in raw]
+        latencies: typing.List[float] = []
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def one(update):
+            async with slots:
+                t0 = time.perf_counter()
+                try:
+                    # latency includes the wait in the chat's queue, as in production
+                    done = await self.main.dp.submit(self.main.bot, update)
+                    await done
+                except Exception:
+                    self.errors += 1  # e.g. an injected 429 inside a handler; polling would log and move on
+                latencies.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(one(u) for u in updates))
+        return latencies
+
+    async def run(self, label: str, raw: typing.List[dict], units: typing.Optional[int] = None):
+        """`units` overrides the update count, e.g. deliveries for a broadcast (latency is then not shown)."""
+        q0, c0, e0 = QUERIES, self.session.calls, self.errors
+        t0 = time.perf_counter()
+        latencies = await self.feed(raw)
+        await self.drain()
+        elapsed = time.perf_counter() - t0
+        report(label, units or len(raw), elapsed, None if units else latencies, QUERIES - q0, self.session.calls - c0,
+               self.errors - e0)
+
+    async def set_state(self, user_ids: typing.Iterable[int], state):
+        from aiogram.fsm.storage.base import StorageKey
+        for uid in user_ids:
+            await self.main.FSM_STORAGE.set_state(StorageKey(BOT_ID, uid, uid), state)
+
+    async def broadcast(self, recipients: int):
+        m = self.main
+        async with m.db_acquire() as conn:
+            await conn.execute("DELETE FROM users WHERE user_id <> $1", ADMIN)
+            await conn.copy_records_to_table(
+                "users", records=((uid,) for uid in range(1_000_000, 1_000_000 + recipients)), columns=("user_id",)
+            )
+        await self.feed([message(ADMIN, ADMIN, "/broadcast")])
+        await self.run(f"broadcast {recipients:,}", [message(ADMIN, ADMIN, "📣 bench")], units=recipients)
+
+
+def percentile(values: typing.Optional[typing.List[float]], p: float) -> str:
+    if not values:
+        return "-"
+    values = sorted(values)
+    return f"{values[min(len(values) - 1, int(len(values) * p))] * 1000:.2f}"
+
+
+def report(label: str, n: int, elapsed: float, latencies, queries: int, calls: int, errors: int):
+    print(f"{label:<22} {n:>8,} {n / elapsed:>12,.0f}/s {percentile(latencies, 0.5):>9} "
+          f"{percentile(latencies, 0.99):>9} {queries / n:>10.2f} {calls / n:>9.2f} {errors:>7}")
+
+
+async def run(args, url: str):
+    schema = f"bench_{os.getpid()}"
+    admin = await asyncpg.connect(url)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    patch_pool(schema)
+    import main  # noqa: E402  (env and pool patch must be in place first)
+    logging.getLogger("aiogram").setLevel(logging.WARNING)  # one INFO line per update otherwise
+
+    session = make_session(main, args.latency, args.rate_limit, args.retry_after)
+    main.bot.session = session
+    services = (main.LOG_SINK, main.PROFILES, main.GROUPS, main.BROADCASTS, main.ALBUMS, main.DELETES,
+                main.FSM_STORAGE, main.ADMIN_RELAY)
+    try:
+        await main.init_db()
+        for service in services:
+            service.start()
+        main.BOT_USERNAME = (await main.bot.get_me()).username
+        bench = Bench(main, session, args.concurrency)
+        import random
+        rng = random.Random(1)
+        scenarios = args.scenario.split(",")
+        everything = "all" in scenarios
+
+        print(f"{'scenario':<22} {'updates':>8} {'throughput':>14} {'p50 ms':>9} {'p99 ms':>9} "
+              f"{'queries/u':>10} {'api/u':>9} {'errors':>7}")
+        if everything or "start" in scenarios:
+            await bench.run("start storm", start_storm(args.updates, rng))
+        if everything or "groups" in scenarios:
+            await bench.run("group chatter", group_chatter(args.updates, rng))
+        if everything or "to_admin" in scenarios:
+            raw = to_admin(args.updates, rng)
+            await bench.set_state({u["message"]["from"]["id"] for u in raw}, main.SendToAdmin.waiting_for_text)
+            await bench.run("user -> admin", raw)
+        if everything or "broadcast" in scenarios:
+            for recipients in (int(r) for r in args.recipients.split(",")):
+                await bench.broadcast(recipients)
+    finally:
+        await main.dp.stop_workers()
+        for service in reversed(services):
+            await service.stop()
+        if main.DB_POOL:
+            await main.DB_POOL.close()
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scenario", default="all", help="comma list of start,groups,to_admin,broadcast or all")
+    ap.add_argument("--updates", type=int, default=5000)
+    ap.add_argument("--recipients", default="10000,100000")
+    ap.add_argument("--concurrency", type=int, default=100, help="updates in flight, like polling tasks")
+    ap.add_argument("--latency", type=float, default=0.01, help="fake Bot API latency (seconds)")
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="fraction of Bot API calls answered with 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--broadcast-rate", default="1000000", help="BROADCAST_RATE for the run (msg/s)")
+    args = ap.parse_args()
+
+    cluster = None
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        cluster = TempCluster()
+        url = cluster.start()
+    os.environ.update({
+        "BOT_TOKEN": f"{BOT_ID}:BENCH",
+        "DATABASE_URL": url,
+        "ADMIN_ID": str(ADMIN),
+        "METRICS_PORT": "0",
+        "BROADCAST_RATE": args.broadcast_rate,
+    })
+    os.environ.pop("WEBHOOK_URL", None)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    try:
+        asyncio.run(run(args, url))
+    finally:
+        if cluster:
+            cluster.stop()
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: group trigger matching (normalization + TriggerEngine) on a Persian chat corpus.
+
+    python bench/bench_triggers.py [--messages 50000] [--triggers 1,10,100]
+
+No database or network is used; BOT_TOKEN/DATABASE_URL get dummy values if unset.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+WORDS = (
+    "سلام خوبی امروز چطوری کسی میدونه این گروه ساعت چند کال داره من دیروز پیام دادم ولی جواب نگرفتم "
+    "لطفا قوانین رو بخونید ادمین کجاست ربات موزیک کار نمیکنه لینک گروه رو بفرستید ممنونم عزیزم "
+    "فردا شب برنامه داریم کسی هست بیاد ویس چت همه آنلاین باشید دوستان عکس پروفایل قشنگه "
+    "خدمات مجازی ممبر واقعی ویو کانال پریمیوم تلگرام قیمت چنده سفارش دادم هنوز نرسیده"
+).split()
+# spellings seen in the wild: Arabic yeh/kaf, ZWNJ, tatweel, diacritics, Persian digits
+NOISE = [
+    lambda w: w.replace("ی", "ي"),
+    lambda w: w.replace("ک", "ك"),
+    lambda w: w[:2] + "\u200c" + w[2:] if len(w) > 3 else w,
+    lambda w: w[:1] + "\u0640" + w[1:],
+    lambda w: w + "\u064b",
+]
+FA_DIGITS = "۰۱۲۳۴۵۶۷۸۹"
+
+
+def make_corpus(n: int, triggers, hit_rate: float, rng: random.Random):
+    corpus = []
+    for _ in range(n):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(3, 25))]
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(triggers) + rng.choice(["", "ش", "جان", "\u200cرو"]))
+        if rng.random() < 0.3:
+            words.append("".join(rng.choice(FA_DIGITS) for _ in range(rng.randint(1, 4))))
+        words = [rng.choice(NOISE)(w) if rng.random() < 0.15 else w for w in words]
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def legacy_contains_malek(text: str) -> bool:
+    t = unicodedata.normalize("NFKC", text or "")
+    t = t.replace("ي", "ی").replace("ك", "ک")
+    return "نارین" in t
+
+
+def make_triggers(count: int, rng: random.Random):
+    patterns = ["نارین"]
+    while len(patterns) < count:
+        w = rng.choice(WORDS) + rng.choice(["ک", "ستان", "یار", "گر", "زاده", "بان"]) + str(len(patterns))
+        if w not in patterns:
+            patterns.append(w)
+    return [main.Trigger(i, p, "reply", 60) for i, p in enumerate(patterns, 1)]
+
+
+def run(label: str, fn, corpus):
+    t0 = time.perf_counter()
+    hits = sum(1 for text in corpus if fn(text))
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {len(corpus) / dt:>12,.0f} msg/s   {dt * 1e6 / len(corpus):6.2f} µs/msg   hits={hits}")
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=50000)
+    ap.add_argument("--triggers", default="1,10,100")
+    ap.add_argument("--hit-rate", type=float, default=0.05)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    counts = [int(c) for c in args.triggers.split(",")]
+    all_triggers = make_triggers(max(counts), rng)
+    corpus = make_corpus(args.messages, [t.pattern for t in all_triggers], args.hit_rate, rng)
+    avg = sum(map(len, corpus)) / len(corpus)
+    print(f"corpus: {len(corpus)} messages, avg {avg:.0f} chars\n")
+
+    run("legacy contains_malek", legacy_contains_malek, corpus)
+    run("_normalize_fa only", main._normalize_fa, corpus)
+    for count in counts:
+        engine = main.TriggerEngine()
+        engine.build(all_triggers[:count])
+        run(f"TriggerEngine ({count} triggers)", engine.match, corpus)
+
+
+if __name__ == "__main__":
+    main_()